@@ -1,16 +1,23 @@
 from collections import defaultdict
 import random
+from agent.bounded_table import BoundedTable
 
 
 class Actor:
-    def __init__(self, actor_alpha, actor_gamma, actor_lambda, epsilon, epsilon_decay):
+    def __init__(self, actor_alpha, actor_gamma, actor_lambda, epsilon, epsilon_decay, capacity=None,
+                 eviction_policy="lru", spill_path=None):
         self.learning_rate = actor_alpha
         self.discount_factor = actor_gamma
         self.eligibility_decay = actor_lambda
         self.epsilon = epsilon
         self.epsilon_decay = epsilon_decay
         self.td_error = None  # TD-error found by critic
-        self.policy = defaultdict(lambda: 0)  # Policy found by actor. Use of defaultdict means that access to non-existing key will add key with default value 0
+        self.capacity = capacity
+        self.eviction_policy = eviction_policy
+        if capacity is None:
+            self.policy = defaultdict(lambda: 0)  # Policy found by actor. Use of defaultdict means that access to non-existing key will add key with default value 0
+        else:  # Bounded policy for large boards, where only the most used SAPs are kept in memory
+            self.policy = BoundedTable(lambda: 0, capacity, eviction_policy, spill_path, key_to_str=sap_to_str)
         self.sap_eligibilities = defaultdict(lambda: 0)  # SAP-based eligibilities found by actor, initialized to 0
 
     def get_action(self, state, actions):
@@ -20,7 +27,7 @@ class Actor:
 
         for available_action in legal_actions:
             sap = (state, available_action)
-            available_actions.update({available_action: self.policy[sap]})  # if sap ∉ policy, value = 0 because of defaultdict
+            available_actions.update({available_action: self.policy.get(sap, 0)})  # if sap ∉ policy, value = 0 (without adding sap to policy)
 
         if len(available_actions) == 0:
             return None
@@ -65,5 +72,38 @@ class Actor:
         """ Set epsilon to given value, used for setting epsilon = 0 for last episode """
         self.epsilon = new_value
 
+    def get_policy_snapshot(self):
+        """ Returns a copy of the current policy and epsilon that can be sent to rollout workers. For a bounded policy
+        only the entries in memory are included, so spilled SAPs have the default value 0 in the snapshot """
+        return dict(self.policy.items()), self.epsilon
+
+    def apply_policy_snapshot(self, snapshot):
+        """ Update policy and epsilon with a snapshot received from the learner. The snapshot may only contain the
+        SAPs that changed since the previous snapshot, so SAPs that are not in the snapshot keep their value """
+        policy, epsilon = snapshot
+        for sap, value in policy.items():
+            self.policy[sap] = value
+        self.epsilon = epsilon
+
+    def get_parameters(self):
+        """ Returns the arguments that create an actor with the same parameters and the same policy capacity, e.g. for
+        rollout workers. The spill path is not included, since each actor needs its own spill store """
+        return (self.learning_rate, self.discount_factor, self.eligibility_decay, self.epsilon, self.epsilon_decay,
+                self.capacity, self.eviction_policy)
+
+    def close(self):
+        """ Close the spill store of a bounded policy, performed when learning is finished """
+        if isinstance(self.policy, BoundedTable):
+            self.policy.close()
+
+    def get_policy_stats(self):
+        """ Returns hit, miss and eviction counters of the policy, or None if the policy is not bounded """
+        if isinstance(self.policy, BoundedTable):
+            return self.policy.get_stats()
+        return None
 
 
+def sap_to_str(sap):
+    """ Convert state-action pair to string (e.g. 11011:(3, 3)(3, 2)(3, 1)) used as key in the spill store """
+    state, action = sap
+    return state + ":" + "".join(str(cell.get_location()) for cell in action)
@@ -1,5 +1,7 @@
 # Code performing the steps of the actor-critic algorithm by calling methods in actor and critic
+import queue
 from visualization import Visualizer
+from agent.rollout_worker import RolloutWorker, MP_CONTEXT, locations_to_action, snapshot_to_locations
 import matplotlib.pyplot as plt
 
 
@@ -10,13 +12,12 @@ class Agent:
         self.episode_num = episode_num
         self.sim_world = sim_world
         self.visualizer = Visualizer(self.sim_world.get_board(), self.sim_world.get_player(), visualization_speed)
+        self.plot_episode_nums = []
+        self.plot_num_pegs_left = []
 
     def learn(self):
         """Runs the steps of the actor-critic algorithm for each episode """
         # The value function of the critic and the policy of the actor is inilialized in critic and actor respectively
-        plot_episode_nums = []
-        plot_num_pegs_left = []
-
         for episode in range(self.episode_num):
 
             # Last episode should exploit and not explore, so epsilon is set to 0
@@ -25,72 +26,204 @@ class Agent:
             else:
                 self.actor.decay_epsilon()
 
-            # List of tuples, where each tuple gives (state, action, reward, next_state)
-            current_episode_steps = []
-
-            # Reset eligibilities in actor and critic
-            self.actor.reset_eligibilities()
-            self.critic.reset_eligibilities()
-
-            # Initialise state and action
-            current_state = self.sim_world.get_board().get_binary_state()
-            legal_actions = self.sim_world.get_legal_actions()
-            current_action = self.actor.get_action(current_state, legal_actions)
-
-            # Repeat for each step of the episode
-            while self.sim_world.is_neutral_state():
-
-                # Step 1-2: perform action, find next state and receive reward
-                next_state, reward = self.sim_world.make_state_transition(current_action)
-                next_legal_actions = self.sim_world.get_legal_actions()
-                next_action = self.actor.get_action(next_state, next_legal_actions)
-
-                # Step 3: Actor increment eligibility of visited SAP
-                self.actor.increment_sap_eligibility((current_state, current_action))
-
-                # Step 4: Critic compute td-error for current state (δ = r + γV(s') - V(s))
-                td_error = self.critic.compute_td_error(reward, current_state, next_state)
-                self.actor.update_td_error(td_error)  # Actor receives TD-error from critic
-
-                # Step 5: Table Critic increment eligibility of visited state.
-                # Neural Critic use weight-gradients to increment eligibility of often visited states (see split_gd.py)
-                if self.critic.get_is_critic_table():
-                    self.critic.increment_state_eligibility(current_state)
-
-                # Step 6: Value function of critic, policy of actor and eligibilites are updated for each SAP in episode
-                for step in current_episode_steps:
-                    sap = step[0:2]  # step = (current_state, current_action, reward, next_state)
-
-                    # Update value function and decay eligibility of critic
-                    if self.critic.get_is_critic_table():
-                        self.critic.update_value(sap[0])
-                        self.critic.decay_state_eligibility(sap[0])
-                    else:
-                        self.critic.update_nn(sap[0], step[2], step[3])  # reward and next_state used to find target value
-
-                    # Update policy and decay eligibility for actor
-                    self.actor.update_policy(sap)
-                    self.actor.decay_sap_eligibility(sap)
-
-                # Found action, reward and transition of current state is saved for further progression in episode
-                current_episode_steps.append((current_state, current_action, reward, next_state))
-                current_state = next_state
-                current_action = next_action
-
-            # Print and plot the result of each episode
-            if len(current_episode_steps) > 0:
-                print("Episode " + str(episode) + " achieves " + str(current_episode_steps[len(current_episode_steps)-1][2]) + " points.")
-                plot_episode_nums.append(episode)
-                plot_num_pegs_left.append(self.sim_world.get_board().get_cell_nums()[0])
-
+            current_episode_steps = self.run_episode()
+            self.record_episode(episode, current_episode_steps, self.sim_world.get_board().get_cell_nums()[0])
             self.sim_world.get_board().reset_board()
 
             # Call visualize_episode for last episode
             if episode == self.episode_num-1:
-                print("Episode " + str(episode) + " achieves " + str(current_episode_steps[len(current_episode_steps)-1][2]) + " points.")
-                self.visualizer.visualize_episode(current_episode_steps)
-                print("Game visualization finished")
-
+                self.visualize_last_episode(episode, current_episode_steps)
+
+        self.plot_learning()
+
+    def learn_async(self, worker_num, queue_size, snapshot_interval):
+        """Runs the actor-critic algorithm with rollout workers that play episodes in their own SimWorld in
+        separate processes, while this process (the learner) updates critic and actor from the finished trajectories.
+        Every snapshot_interval episodes the workers receive the policy values that changed since the previous
+        snapshot. The last episode is played greedily by the learner itself, as in learn()"""
+        if worker_num < 1 or snapshot_interval < 1:
+            raise ValueError("worker_num and snapshot_interval must be at least 1")
+        trajectory_queue = MP_CONTEXT.Queue(maxsize=queue_size)  # bounded, so workers can not run far ahead of the learner
+        stop_event = MP_CONTEXT.Event()
+        workers = [RolloutWorker(self.sim_world.get_parameters(), self.actor.get_parameters(), trajectory_queue, stop_event)
+                   for _ in range(worker_num)]
+        initial_snapshot = snapshot_to_locations(self.actor.get_policy_snapshot())
+        for worker in workers:
+            worker.start()
+            worker.send_policy_snapshot(initial_snapshot)
+
+        try:
+            updated_saps = set()  # SAPs whose policy value changed since the previous snapshot
+            for episode in range(self.episode_num-1):
+                self.actor.decay_epsilon()  # epsilon reaches the workers through the policy snapshots
+                episode_steps, pegs_left = self.get_worker_episode(trajectory_queue, workers)
+                self.learn_from_episode(episode_steps)
+                self.record_episode(episode, episode_steps, pegs_left)
+                updated_saps.update(step[0:2] for step in episode_steps)  # policy is only updated for SAPs in episode
+
+                if (episode+1) % snapshot_interval == 0:
+                    snapshot = snapshot_to_locations(({sap: self.actor.policy[sap] for sap in updated_saps}, self.actor.epsilon))
+                    for worker in workers:
+                        worker.send_policy_snapshot(snapshot)
+                    updated_saps = set()
+        finally:
+            stop_workers(workers, trajectory_queue, stop_event)
+
+        # Last episode should exploit and not explore, and is visualized
+        last_episode = self.episode_num-1
+        self.actor.set_epsilon(0)
+        self.sim_world.get_board().reset_board()
+        current_episode_steps = self.run_episode()
+        self.record_episode(last_episode, current_episode_steps, self.sim_world.get_board().get_cell_nums()[0])
+        self.sim_world.get_board().reset_board()
+        self.visualize_last_episode(last_episode, current_episode_steps)
+
+        self.plot_learning()
+
+    def get_worker_episode(self, trajectory_queue, workers):
+        """Waits for the next episode from the rollout workers and returns (episode steps, pegs left), where the
+        actions are converted from cell locations to cells of the learner's board. Raises an error if a worker
+        failed or if all workers stopped"""
+        while True:
+            try:
+                item = trajectory_queue.get(timeout=1)
+                break
+            except queue.Empty:
+                if not any(worker.is_alive() for worker in workers):
+                    raise RuntimeError("All rollout workers stopped without sending episodes")
+        if item[0] == "error":
+            raise RuntimeError("Rollout worker failed:\n" + item[1])
+        _, worker_steps, pegs_left = item
+        board = self.sim_world.get_board()
+        episode_steps = [(state, locations_to_action(locations, board), reward, next_state, observation, next_observation)
+                         for state, locations, reward, next_state, observation, next_observation in worker_steps]
+        return episode_steps, pegs_left
+
+    def run_episode(self):
+        """Plays one episode in the sim_world of the agent while updating critic and actor for each step.
+        Returns list of tuples, where each tuple gives (state, action, reward, next_state, observation, next_observation)"""
+        current_episode_steps = []
+
+        # Reset eligibilities in actor and critic
+        self.actor.reset_eligibilities()
+        self.critic.reset_eligibilities()
+
+        # Initialise state and action
+        current_state = self.sim_world.get_board().get_binary_state()
+        legal_actions = self.sim_world.get_legal_actions()
+        current_action = self.actor.get_action(current_state, legal_actions)
+        current_observation = self.get_critic_observation()
+
+        # Repeat for each step of the episode
+        while self.sim_world.is_neutral_state():
+
+            # Step 1-2: perform action, find next state and receive reward
+            next_state, reward = self.sim_world.make_state_transition(current_action)
+            next_legal_actions = self.sim_world.get_legal_actions()
+            next_action = self.actor.get_action(next_state, next_legal_actions)
+            next_observation = self.get_critic_observation()
+
+            self.update_step(current_episode_steps, current_state, current_action, reward, next_state,
+                             current_observation, next_observation)
+
+            # Found action, reward and transition of current state is saved for further progression in episode
+            current_episode_steps.append((current_state, current_action, reward, next_state, current_observation, next_observation))
+            current_state = next_state
+            current_action = next_action
+            current_observation = next_observation
+        return current_episode_steps
+
+    def learn_from_episode(self, episode_steps):
+        """Updates critic and actor from an episode that is already played (e.g. by a rollout worker),
+        performing the same updates as run_episode does while playing"""
+        self.actor.reset_eligibilities()
+        self.critic.reset_eligibilities()
+        previous_steps = []
+        for step in episode_steps:
+            self.update_step(previous_steps, *step)
+            previous_steps.append(step)
+
+    def get_critic_observation(self):
+        """Neural Critic is given the float32 observation of the current state from the environment, so the state
+        does not need to be converted from string. Table Critic uses the binary state and gets None"""
+        if self.critic.get_is_critic_table():
+            return None
+        return self.sim_world.get_observation()
+
+    def update_step(self, current_episode_steps, current_state, current_action, reward, next_state,
+                    current_observation=None, next_observation=None):
+        """Step 3-6 of the actor-critic algorithm for one transition, where current_episode_steps
+        contains the earlier steps of the episode"""
+        # Step 3: Actor increment eligibility of visited SAP
+        self.actor.increment_sap_eligibility((current_state, current_action))
+
+        # Step 4: Critic compute td-error for current state (δ = r + γV(s') - V(s))
+        td_error = self.critic.compute_td_error(reward, critic_state(current_state, current_observation),
+                                                critic_state(next_state, next_observation))
+        self.actor.update_td_error(td_error)  # Actor receives TD-error from critic
+
+        # Step 5: Table Critic increment eligibility of visited state.
+        # Neural Critic use weight-gradients to increment eligibility of often visited states (see split_gd.py)
+        if self.critic.get_is_critic_table():
+            self.critic.increment_state_eligibility(current_state)
+
+        # Step 6: Value function of critic, policy of actor and eligibilites are updated for each SAP in episode
+        for step in current_episode_steps:
+            sap = step[0:2]  # step = (current_state, current_action, reward, next_state, observation, next_observation)
+
+            # Update value function and decay eligibility of critic
+            if self.critic.get_is_critic_table():
+                self.critic.update_value(sap[0])
+                self.critic.decay_state_eligibility(sap[0])
+            else:
+                self.critic.update_nn(critic_state(sap[0], step[4]), step[2], critic_state(step[3], step[5]))  # reward and next_state used to find target value
+
+            # Update policy and decay eligibility for actor
+            self.actor.update_policy(sap)
+            self.actor.decay_sap_eligibility(sap)
+
+    def record_episode(self, episode, current_episode_steps, pegs_left):
+        """Print and save the result of the episode for the learning plot"""
+        if len(current_episode_steps) > 0:
+            print("Episode " + str(episode) + " achieves " + str(current_episode_steps[len(current_episode_steps)-1][2]) + " points.")
+            self.plot_episode_nums.append(episode)
+            self.plot_num_pegs_left.append(pegs_left)
+
+    def visualize_last_episode(self, episode, current_episode_steps):
+        print("Episode " + str(episode) + " achieves " + str(current_episode_steps[len(current_episode_steps)-1][2]) + " points.")
+        self.visualizer.visualize_episode(current_episode_steps)
+        print("Game visualization finished")
+
+    def plot_learning(self):
+        self.print_cache_stats()
         print("Plotting")
-        plt.plot(plot_episode_nums, plot_num_pegs_left)
+        plt.plot(self.plot_episode_nums, self.plot_num_pegs_left)
         plt.savefig('images/learning_plot.png')
+
+    def print_cache_stats(self):
+        """Print hit, miss and eviction counters of transposition cache, bounded policy and value function (if used)"""
+        if self.sim_world.get_cache_stats() is not None:
+            print("Transposition cache: " + str(self.sim_world.get_cache_stats()))
+        if self.actor.get_policy_stats() is not None:
+            print("Policy table: " + str(self.actor.get_policy_stats()))
+        if self.critic.get_is_critic_table() and self.critic.get_value_function_stats() is not None:
+            print("Value function table: " + str(self.critic.get_value_function_stats()))
+
+
+def stop_workers(workers, trajectory_queue, stop_event):
+    """Stop the rollout workers. The trajectory queue is emptied while waiting, since a process can not exit
+    before the items it has put in a queue are read"""
+    stop_event.set()
+    while any(worker.is_alive() for worker in workers):
+        try:
+            trajectory_queue.get(timeout=0.1)
+        except queue.Empty:
+            pass
+    for worker in workers:
+        worker.join()
+    trajectory_queue.close()
+
+
+def critic_state(state, observation):
+    """Returns the observation of the state if there is one, otherwise the binary state"""
+    return state if observation is None else observation
@@ -0,0 +1,161 @@
+from collections import OrderedDict
+import pickle
+import sqlite3
+
+
+class BoundedTable:
+    """Capacity-limited replacement for the defaultdicts used as value function (critic) and policy (actor).
+    Access to a non-existing key adds the key with a value from default_factory, as for defaultdict. When more than
+    capacity entries are stored, entries are evicted either by least recently used ("lru") or by least visited
+    ("least_visited"). Visit counts are halved every capacity inserts, so entries that were visited often long ago
+    can leave the table when the working set moves on. Evicted entries are lost, unless spill_path is given, in which
+    case they are written to a SQLite database and loaded again the next time they are accessed. Loaded entries are
+    deleted from the database, whose free pages are reused, so the file only grows with the number of spilled entries.
+    key_from_str is only needed to include the spilled entries in items(include_spilled=True)"""
+    def __init__(self, default_factory, capacity, eviction_policy="lru", spill_path=None, key_to_str=repr, key_from_str=None):
+        if eviction_policy not in ("lru", "least_visited"):
+            raise ValueError("Unknown eviction policy: " + str(eviction_policy))
+        if capacity < 1:
+            raise ValueError("Capacity must be at least 1")
+        self.default_factory = default_factory
+        self.capacity = capacity
+        self.eviction_policy = eviction_policy
+        self.key_to_str = key_to_str  # spilled entries are stored with string keys
+        self.key_from_str = key_from_str
+        self.spill_store = open_spill_store(spill_path) if spill_path else None
+        self.entries = OrderedDict()  # most recently used entries are at the end
+        self.visits = {}  # number of accesses of each resident entry, used by least_visited eviction
+        self.inserts_since_aging = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.spill_hits = 0  # misses that were found in the spill store
+
+    def __getitem__(self, key):
+        if key in self.entries:
+            self.hits += 1
+            self.touch(key)
+            return self.entries[key]
+        self.misses += 1
+        value = self.load_spilled(key)
+        if value is None:
+            value = self.default_factory()
+        self.insert(key, value)
+        return value
+
+    def get(self, key, default=None):
+        """ Returns value of key, or default if the key is not in the table, without adding the key. Used for
+        reads that should not fill the table with default values (e.g. scoring actions that are not chosen) """
+        if key in self.entries:
+            self.hits += 1
+            self.touch(key)
+            return self.entries[key]
+        self.misses += 1
+        value = self.peek_spilled(key)
+        return default if value is None else value
+
+    def __setitem__(self, key, value):
+        if key in self.entries:
+            self.entries[key] = value
+            self.touch(key)
+        else:
+            self.insert(key, value)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def items(self, include_spilled=False):
+        """ Returns (key, value) of the resident entries without counting them as accesses. Entries in the spill
+        store are only included if include_spilled is true, which requires key_from_str """
+        if not include_spilled or self.spill_store is None:
+            return list(self.entries.items())
+        if self.key_from_str is None:
+            raise ValueError("key_from_str is needed to include spilled entries")
+        spilled_items = [(self.key_from_str(str_key), pickle.loads(value))
+                         for str_key, value in self.spill_store.execute("SELECT key, value FROM spilled")]
+        return list(self.entries.items()) + spilled_items
+
+    def touch(self, key):
+        """ Mark entry as used, so it is kept longer by the eviction policy """
+        if self.eviction_policy == "lru":
+            self.entries.move_to_end(key)
+        else:
+            self.visits[key] += 1
+
+    def insert(self, key, value):
+        self.entries[key] = value
+        if self.eviction_policy == "least_visited":
+            self.visits[key] = 1
+            self.age_visits()
+        if len(self.entries) > self.capacity:
+            self.evict(key)
+
+    def age_visits(self):
+        """ Halve all visit counts every capacity inserts, so old visits count less than recent visits """
+        self.inserts_since_aging += 1
+        if self.inserts_since_aging >= self.capacity:
+            self.inserts_since_aging = 0
+            for key in self.visits:
+                self.visits[key] //= 2
+
+    def evict(self, inserted_key):
+        """ Remove entries until the table is within capacity. The inserted key is never evicted, since its value is
+        about to be used. Least visited eviction removes the least visited tenth of the table at once, so the sorting
+        is not repeated for every insert """
+        if self.eviction_policy == "lru":
+            evicted_keys = [next(iter(self.entries))]  # the inserted key is the most recently used
+        else:
+            evict_num = max(1, len(self.entries) - self.capacity, self.capacity // 10)
+            candidates = (key for key in self.visits if key != inserted_key)
+            evicted_keys = sorted(candidates, key=self.visits.get)[:evict_num]
+        for key in evicted_keys:
+            value = self.entries.pop(key)
+            self.visits.pop(key, None)
+            if self.spill_store is not None:
+                self.spill_store.execute("INSERT OR REPLACE INTO spilled VALUES (?, ?)",
+                                         (self.key_to_str(key), pickle.dumps(value, pickle.HIGHEST_PROTOCOL)))
+        self.evictions += len(evicted_keys)
+
+    def peek_spilled(self, key):
+        """ Returns value of key from the spill store, or None if the key was never spilled """
+        if self.spill_store is None:
+            return None
+        row = self.spill_store.execute("SELECT value FROM spilled WHERE key = ?", (self.key_to_str(key),)).fetchone()
+        return None if row is None else pickle.loads(row[0])
+
+    def load_spilled(self, key):
+        """ Returns and removes value of key from the spill store, or None if the key was never spilled """
+        value = self.peek_spilled(key)
+        if value is not None:
+            self.spill_hits += 1
+            self.spill_store.execute("DELETE FROM spilled WHERE key = ?", (self.key_to_str(key),))
+        return value
+
+    def get_stats(self):
+        """ Returns counters describing how well the table keeps the working set """
+        return {"size": len(self.entries), "capacity": self.capacity, "hits": self.hits, "misses": self.misses,
+                "evictions": self.evictions, "spill_hits": self.spill_hits}
+
+    def close(self):
+        """ Close the spill store (if any), which writes the spilled entries to disk """
+        if self.spill_store is not None:
+            self.spill_store.commit()
+            self.spill_store.close()
+            self.spill_store = None
+
+
+def open_spill_store(spill_path):
+    """ Creates an empty SQLite database for spilled entries. The database is a cache of evicted entries, so it is
+    written without journal and fsync, and all writes are committed when the table is closed """
+    spill_store = sqlite3.connect(spill_path)
+    spill_store.execute("PRAGMA journal_mode = OFF")
+    spill_store.execute("PRAGMA synchronous = OFF")
+    spill_store.execute("DROP TABLE IF EXISTS spilled")
+    spill_store.execute("CREATE TABLE spilled (key TEXT PRIMARY KEY, value BLOB)")
+    return spill_store
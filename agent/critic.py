@@ -1,12 +1,14 @@
 from collections import defaultdict
+import json
 import random
 import tensorflow as tf
 import numpy as np
 from tensorflow import keras as KER
-from tensorflow.keras.optimizers import Adadelta
+from tensorflow.keras.optimizers import Adadelta, Adam
 from tensorflow.keras.losses import MeanSquaredError
 from tensorflow import zeros_like
 from agent.split_gd import SplitGD
+from agent.bounded_table import BoundedTable
 
 
 class Critic:
@@ -18,6 +20,10 @@ class Critic:
         self.td_error = None
         self.is_critic_table = is_critic_table
 
+    def close(self):
+        """ Release resources held by the critic, performed when learning is finished """
+        pass
+
     def get_is_critic_table(self):
         """Return true if critic is Table and false if critic is Neural"""
         return self.is_critic_table
@@ -33,9 +39,14 @@ class Critic:
 
 class TableCritic(Critic):
     """Sub class for making table critic"""
-    def __init__(self, critic_alpha, critic_gamma, critic_lambda, is_critic_table):
+    def __init__(self, critic_alpha, critic_gamma, critic_lambda, is_critic_table, capacity=None,
+                 eviction_policy="lru", spill_path=None):
         super().__init__(critic_alpha, critic_gamma, critic_lambda, is_critic_table)
-        self.value_function = defaultdict(lambda: random.uniform(0, 1))  # V(s) initialized with small random values
+        if capacity is None:
+            self.value_function = defaultdict(lambda: random.uniform(0, 1))  # V(s) initialized with small random values
+        else:  # Bounded value function for large boards, where only the most used states are kept in memory
+            self.value_function = BoundedTable(lambda: random.uniform(0, 1), capacity, eviction_policy, spill_path,
+                                               key_to_str=str, key_from_str=str)
         self.state_eligibilities = defaultdict(lambda: 0)
 
     def get_value(self, state):
@@ -61,11 +72,33 @@ class TableCritic(Critic):
         """ Reset eligibility of all states, performed in beginning of each episode"""
         self.state_eligibilities = defaultdict(lambda: 0)
 
+    def save_value_function(self, path):
+        """ Save the value function as a JSON object of state -> value, e.g. to warm start a Neural Critic.
+        For a bounded value function the entries spilled to disk are saved as well """
+        if isinstance(self.value_function, BoundedTable):
+            value_items = self.value_function.items(include_spilled=True)
+        else:
+            value_items = self.value_function.items()
+        with open(path, "w") as file:
+            json.dump(dict(value_items), file)
+
+    def close(self):
+        """ Close the spill store of a bounded value function """
+        if isinstance(self.value_function, BoundedTable):
+            self.value_function.close()
+
+    def get_value_function_stats(self):
+        """ Returns hit, miss and eviction counters of the value function, or None if it is not bounded """
+        if isinstance(self.value_function, BoundedTable):
+            return self.value_function.get_stats()
+        return None
+
 
 class NeuralCritic(Critic):
     """Sub class for making neural critic"""
     def __init__(self, critic_alpha, critic_gamma, critic_lambda, input_size, hidden_layers_dim, is_critic_table):
         super().__init__(critic_alpha, critic_gamma, critic_lambda, is_critic_table)
+        self.input_size = input_size
         self.value_function_model = self.init_nn(input_size, hidden_layers_dim)  # hidden_layers_dim is list of hidden layers sizes
         self.state_eligibilities = self.reset_eligibilities()  # for NN, eligibilities will affect each weight in network and not states
         self.split_gd = SplitGD(self.value_function_model, self.state_eligibilities, critic_alpha, critic_lambda, critic_gamma, self.td_error)
@@ -87,10 +120,10 @@ class NeuralCritic(Critic):
 
     def get_value(self, state):
         """The value function gives the predicted value of being in the given state. For NN this
-        will be the output of the neural model found by giving the state as input. The state is a string
-        (e.g. 111011111) and needs to be converted to a tensor before it can be given to the model"""
-        tensor_state = convert_state_to_tensor(state)
-        return self.value_function_model(tensor_state)
+        will be the output of the neural model found by giving the state as input. The state is either an
+        observation from the environment (float32 array that is given directly to the model) or a string
+        (e.g. 111011111) that needs to be converted to a tensor before it can be given to the model"""
+        return self.value_function_model(convert_state_to_model_input(state))
 
     def update_nn(self, current_state, reward, next_state):
         """The value function of Neural Critic is updated by calling the fit-method of SplitGD.
@@ -98,8 +131,27 @@ class NeuralCritic(Critic):
         and uses these to update the weights of the network to attempt to improve the value function"""
         value_next_state = self.get_value(next_state)
         target_value = reward + self.discount_factor * value_next_state
-        tensor_current_state = convert_state_to_tensor(current_state)
-        self.split_gd.fit(tensor_current_state, target_value)
+        self.split_gd.fit(convert_state_to_model_input(current_state), target_value)
+
+    def warm_start(self, value_table, epochs=50, batch_size=64, learning_rate=0.01, verbosity=0):
+        """Pretrain the model on known values before online learning with SplitGD takes over, e.g. from a saved
+        Table Critic (see load_value_table) or any other mapping of binary state -> value. All states are converted
+        to one array and trained with the regular fit of the model, i.e. in batches instead of one state at a time.
+        The online Adadelta (with critic_alpha) hardly moves the weights in a few epochs, so the model is fitted with
+        its own Adam optimizer and compiled with the online optimizer again afterwards"""
+        if len(value_table) == 0:
+            return None
+        states, values = zip(*value_table.items())
+        if any(len(state) != self.input_size for state in states):
+            raise ValueError("All states in value table must have " + str(self.input_size) + " cells")
+        features = convert_states_to_array(states)
+        targets = np.array(values, dtype=np.float32).reshape(-1, 1)
+        online_optimizer = self.value_function_model.optimizer
+        try:
+            self.value_function_model.compile(optimizer=Adam(learning_rate=learning_rate), loss=MeanSquaredError())
+            return self.value_function_model.fit(features, targets, epochs=epochs, batch_size=batch_size, shuffle=True, verbose=verbosity)
+        finally:  # online learning continues with Adadelta and critic_alpha
+            self.value_function_model.compile(optimizer=online_optimizer, loss=MeanSquaredError(), metrics=["mean_squared_error"])
 
     def reset_eligibilities(self):
         """ For Neural Critic, eligibilities are applied to weights that are tensors (i.e. array-like objects).
@@ -111,6 +163,26 @@ class NeuralCritic(Critic):
         return state_eligibilities
 
 
+def convert_state_to_model_input(state):
+    """Observations from the environment already have the input shape of the model and are used without copying,
+    while binary states in string format are converted"""
+    if isinstance(state, np.ndarray):
+        return state
+    return convert_state_to_tensor(state)
+
+
+def convert_states_to_array(states):
+    """Convert list of states in string format to float32 array with one row per state, without splitting each string"""
+    state_bytes = np.frombuffer("".join(states).encode(), dtype=np.uint8)  # characters "0" and "1" are bytes 48 and 49
+    return (state_bytes - ord("0")).astype(np.float32).reshape(len(states), -1)
+
+
+def load_value_table(path):
+    """Load value function saved by TableCritic.save_value_function as dictionary of state -> value"""
+    with open(path) as file:
+        return json.load(file)
+
+
 def convert_state_to_tensor(state):
     """Convert given state from string format to tensor (i.e. array-like object)"""
     state_array = np.array(list(state))  # make numpy array of string
@@ -0,0 +1,114 @@
+# Producer processes playing episodes for the asynchronous actor-critic learner (see learn_async in actor_critic_agent.py)
+import multiprocessing
+import queue
+import random
+import traceback
+from environment.sim_world import SimWorld
+from agent.actor import Actor
+
+# Workers are started with spawn, so they do not inherit the (possibly TensorFlow initialized) state of the learner
+MP_CONTEXT = multiprocessing.get_context("spawn")
+
+
+class RolloutWorker:
+    """Handle used by the learner for one producer process. The process plays episodes in its own SimWorld with a
+    copy of the actor's policy, and puts the finished trajectories in a bounded queue consumed by the learner.
+    The learner keeps the copy up to date by sending the policy values that changed. Cells can not be sent between
+    processes, so actions in trajectories and policy snapshots are sent as cell locations"""
+    def __init__(self, world_parameters, actor_parameters, trajectory_queue, stop_event):
+        self.snapshot_queue = MP_CONTEXT.Queue()  # unbounded, since every snapshot holds changes that must be applied
+        self.process = MP_CONTEXT.Process(target=run_rollouts, daemon=True,
+                                          args=(world_parameters, actor_parameters, trajectory_queue,
+                                                self.snapshot_queue, stop_event))
+
+    def start(self):
+        self.process.start()
+
+    def is_alive(self):
+        return self.process.is_alive()
+
+    def send_policy_snapshot(self, location_snapshot):
+        """ Send (policy values, epsilon) to the worker, where policy values are keyed by (state, action locations)
+        and contain the full policy or only the SAPs that changed since the previous snapshot """
+        self.snapshot_queue.put(location_snapshot)
+
+    def join(self):
+        self.process.join()
+        self.snapshot_queue.cancel_join_thread()  # unread snapshots should not block the learner from exiting
+        self.snapshot_queue.close()
+
+
+def run_rollouts(world_parameters, actor_parameters, trajectory_queue, snapshot_queue, stop_event):
+    """ Target of the worker process. Produce episodes until the learner sets the stop event. Errors are sent to the
+    learner through the trajectory queue, so the learner does not wait for episodes that will never come """
+    try:
+        random.seed()  # each worker explores with its own random numbers
+        sim_world = SimWorld(*world_parameters)
+        actor = Actor(*actor_parameters)  # bounded like the learner's policy (without spilling), so memory stays limited
+        while not stop_event.is_set():
+            apply_snapshots(actor, snapshot_queue, sim_world.get_board())
+            episode_steps = play_episode(sim_world, actor)
+            pegs_left = sim_world.get_board().get_cell_nums()[0]
+            put_until_stopped(trajectory_queue, ("episode", episode_steps, pegs_left), stop_event)
+    except Exception:
+        put_until_stopped(trajectory_queue, ("error", traceback.format_exc()), stop_event)
+
+
+def apply_snapshots(actor, snapshot_queue, board):
+    """ Apply the policy snapshots received since the previous episode (in order), so the worker plays with the
+    newest policy """
+    while True:
+        try:
+            location_snapshot = snapshot_queue.get_nowait()
+        except queue.Empty:
+            return
+        actor.apply_policy_snapshot(snapshot_from_locations(location_snapshot, board))
+
+
+def play_episode(sim_world, actor):
+    """ Plays one episode and returns list of tuples, where each tuple gives (state, action locations, reward,
+    next_state, observation, next_observation). Observations are None, because the learner's critic uses the binary
+    states of trajectories from workers """
+    sim_world.get_board().reset_board()
+    episode_steps = []
+    current_state = sim_world.get_board().get_binary_state()
+    current_action = actor.get_action(current_state, sim_world.get_legal_actions())
+    while sim_world.is_neutral_state():
+        next_state, reward = sim_world.make_state_transition(current_action)
+        next_action = actor.get_action(next_state, sim_world.get_legal_actions())
+        episode_steps.append((current_state, action_to_locations(current_action), reward, next_state, None, None))
+        current_state = next_state
+        current_action = next_action
+    return episode_steps
+
+
+def put_until_stopped(trajectory_queue, item, stop_event):
+    """ Waiting on a full queue is done with a timeout, so the worker does not block forever when the learner stops """
+    while not stop_event.is_set():
+        try:
+            trajectory_queue.put(item, timeout=0.1)
+            return
+        except queue.Full:
+            continue
+
+
+def action_to_locations(action):
+    """ Convert action (moving cell, jumping cell, hole cell) to tuple of cell locations """
+    return tuple(cell.get_location() for cell in action)
+
+
+def locations_to_action(locations, board):
+    """ Convert tuple of cell locations back to action with the cells of the given board """
+    return tuple(board.get_cell(row, col) for row, col in locations)
+
+
+def snapshot_to_locations(snapshot):
+    """ Convert snapshot keyed by (state, action) to snapshot keyed by (state, action locations) """
+    policy, epsilon = snapshot
+    return {(state, action_to_locations(action)): value for (state, action), value in policy.items()}, epsilon
+
+
+def snapshot_from_locations(location_snapshot, board):
+    """ Convert snapshot keyed by (state, action locations) to snapshot keyed by (state, action) with cells of board """
+    policy, epsilon = location_snapshot
+    return {(state, locations_to_action(locations, board)): value for (state, locations), value in policy.items()}, epsilon
@@ -0,0 +1,87 @@
+from functools import lru_cache
+
+
+class BoardTopology:
+    """ Immutable layout of a peg solitaire board: location and neighbors of each cell, and all jumps that are
+    possible on the board. Cells are identified by their index (row by row). The layout only depends on size and
+    shape, so one topology is shared by all boards with the same size and shape (see get_topology) """
+    __slots__ = ("size", "is_diamond", "locations", "indices", "neighbors", "jumps")
+
+    def __init__(self, size, is_diamond, locations, neighbors):
+        self.size = size
+        self.is_diamond = is_diamond
+        self.locations = tuple(locations)  # (row, col) of each cell index
+        self.indices = {location: index for index, location in enumerate(self.locations)}  # index of each location
+        self.neighbors = tuple(tuple(cell_neighbors) for cell_neighbors in neighbors)  # neighbor indices of each cell
+        self.jumps = self.find_jumps()
+
+    def __setattr__(self, name, value):
+        """ Attributes can only be set once (in __init__), since the topology is shared between boards """
+        if hasattr(self, name):
+            raise AttributeError("BoardTopology is immutable")
+        super().__setattr__(name, value)
+
+    def get_cell_num(self):
+        return len(self.locations)
+
+    def find_jumps(self):
+        """ Returns all jumps on the board as tuples of indices (moving cell, jumping cell, hole cell). A jump is
+        legal when moving and jumping cell are pegs and hole cell is a hole. Jumps are ordered by hole cell, then by
+        jumping and moving cell in neighbor order, which is the order legal actions are given to the actor """
+        jumps = []
+        for hole in range(len(self.locations)):
+            hole_row, hole_col = self.locations[hole]
+            for neighbor in self.neighbors[hole]:  # cells that can be jumped over into the hole
+                neigh_row, neigh_col = self.locations[neighbor]
+                for moving in self.neighbors[neighbor]:  # cells that can jump over the neighbor
+                    jump_row, jump_col = self.locations[moving]
+                    if moving != hole and ((jump_row == neigh_row == hole_row) or (jump_col == neigh_col == hole_col) or
+                                           ((abs(hole_row-jump_row) == 2) and (abs(hole_col-jump_col) == 2))):
+                        jumps.append((moving, neighbor, hole))
+        return tuple(jumps)
+
+
+@lru_cache(maxsize=None)
+def get_topology(size, is_diamond):
+    """ Returns the shared topology for the given board size and shape, which is only made the first time """
+    if is_diamond:
+        return make_diamond_topology(size)
+    return make_triangle_topology(size)
+
+
+def make_diamond_topology(size):
+    """ Creates cells and neighborhood following Diamond structure requirements """
+    locations = [(r, c) for r in range(size) for c in range(size)]
+    indices = {location: index for index, location in enumerate(locations)}
+    neighbors = [[] for _ in locations]
+    for r in range(size):
+        for c in range(size):  # avoid redundant calculation by adding neighbors "behind" current cell
+            if c > 0:  # add left neighbor-cell
+                add_neighbor(neighbors, indices[(r, c)], indices[(r, c-1)])
+            if r > 0:  # add above neighbor-cell
+                add_neighbor(neighbors, indices[(r, c)], indices[(r-1, c)])
+            if r > 0 and c < size-1:  # add right diagonal neighbor-cell
+                add_neighbor(neighbors, indices[(r, c)], indices[(r-1, c+1)])
+    return BoardTopology(size, True, locations, neighbors)
+
+
+def make_triangle_topology(size):
+    """ Creates cells and neighborhood following triangle structure requirements """
+    locations = [(r, c) for r in range(size) for c in range(r + 1)]  # achieve triangle shape
+    indices = {location: index for index, location in enumerate(locations)}
+    neighbors = [[] for _ in locations]
+    for r in range(size):  # avoid redundant calculation by adding neighbors "behind" current cell
+        for c in range(r + 1):
+            if c > 0:  # add right neighbor-cell
+                add_neighbor(neighbors, indices[(r, c)], indices[(r, c-1)])
+            if r > 0 and c < r:  # add above neighbor-cell
+                add_neighbor(neighbors, indices[(r, c)], indices[(r-1, c)])
+            if r > 0 and c > 0:  # add left diagonal neighbor-cell
+                add_neighbor(neighbors, indices[(r, c)], indices[(r-1, c-1)])
+    return BoardTopology(size, False, locations, neighbors)
+
+
+def add_neighbor(neighbors, cell, neighbor_cell):
+    """ Adds neighbor relationship to both connected cells """
+    neighbors[cell].append(neighbor_cell)
+    neighbors[neighbor_cell].append(cell)
@@ -1,10 +1,20 @@
 class Cell:
-    """ Class for making a peg solitaire piece which is a Cell object"""
-    def __init__(self, row, column):
-        self.location = (row, column)
-        self.name = "Cell" + str(row) + str(column)
-        self.neighbor_list = []
-        self.is_hole = False
+    """ Class for making a peg solitaire piece which is a Cell object. The cell only stores its board and its index,
+    while location and neighbors are found in the shared board topology and peg/hole in the occupancy of the board """
+    __slots__ = ("board", "index")
+
+    def __init__(self, board, index):
+        self.board = board
+        self.index = index  # position of cell in the board topology, board state and observation buffer
+
+    @property
+    def location(self):
+        return self.board.topology.locations[self.index]
+
+    @property
+    def name(self):
+        row, column = self.location
+        return "Cell" + str(row) + str(column)
 
     def __str__(self):
         """ Changes Cell object representation to string format to make debugging easier"""
@@ -14,25 +24,18 @@ class Cell:
         """ Changes Cell object representation to string format to make debugging easier"""
         return self.name
 
-    def add_neighbor(self, neighbor_cell):
-        """ Adds neighbor relationship to both connected cells"""
-        self.neighbor_list.append(neighbor_cell)
-        neighbor_cell.neighbor_list.append(self)
-
     def get_neighbors(self):
         """ Gets list of neighbor cells to current cell"""
-        return self.neighbor_list
+        return [self.board.cells[index] for index in self.board.topology.neighbors[self.index]]
 
     def get_is_hole(self):
         """ Returns if cell is peg or hole"""
-        return self.is_hole
+        return not self.board.occupancy[self.index]
 
     def set_is_hole(self, value):
         """ Change status of cell to peg (value = false) or hole (value = true)"""
         if isinstance(value, bool):
-            self.is_hole = value
+            self.board.set_is_hole(self, value)
 
     def get_location(self):
         return self.location
-
-
@@ -1,118 +1,120 @@
+import numpy as np
 from environment.cell import Cell
+from environment.board_topology import get_topology
+
+BINARY_DIGITS = bytes.maketrans(b"\x00\x01", b"01")  # translates occupancy (0 = hole, 1 = peg) to binary state
 
 
 class HexagonalGrid:
-    """ Class for making a peg solitaire board which is a Hexagonal grid """
-    def __init__(self, size, holes):
+    """ Class for making a peg solitaire board which is a Hexagonal grid. The layout of the board is a topology
+    that is shared by all boards of the same size and shape, while the board itself only stores the occupancy """
+    def __init__(self, size, holes, is_diamond):
         self.boardSize = size
-        self.board = [[None for i in range(self.boardSize)] for j in range(self.boardSize)]
+        self.topology = get_topology(size, is_diamond)
+        self.cells = tuple(Cell(self, index) for index in range(self.topology.get_cell_num()))
+        # (action, moving, jumping, hole) of each jump in the topology, where action is the tuple of Cell objects
+        # (moving cell, jumping cell, hole cell), so legal actions do not need to create new tuples
+        self.jump_actions = tuple(((self.cells[moving], self.cells[jumping], self.cells[hole]), moving, jumping, hole)
+                                  for moving, jumping, hole in self.topology.jumps)
+        self.occupancy = bytearray(b"\x01" * len(self.cells))  # peg = 1 and hole = 0 for each cell index
+        # float32 occupancy of each state in the episode. Every move removes a peg, so an episode never has more states than cells
+        self.observations = np.zeros((len(self.cells) + 1, len(self.cells)), dtype=np.float32)
+        self.observation_step = 0  # row of observations that holds the current state
+        self.state_version = 0  # changed every time the occupancy changes
         self.holes = holes
         self.init_holes(self.holes)
+        self.write_observation()
 
     def get_cell(self, row, col):
         """ Returns Cell object at given location if it exists """
-        if 0 <= row < self.boardSize and 0 <= col < self.boardSize:
-            return self.board[row][col]
+        index = self.topology.indices.get((row, col))
+        if index is not None:
+            return self.cells[index]
 
     def get_cells(self):
-        """ Returns all Cell objects from board that is not None (i.e. pegs AND holes) """
-        cell_list = []
-        for cell_row in self.board:
-            for current_cell in cell_row:
-                if current_cell is not None:
-                    cell_list.append(current_cell)
-        return cell_list
+        """ Returns all Cell objects from board (i.e. pegs AND holes) """
+        return list(self.cells)
 
     def get_pegs(self):
         """ Returns Cell objects from board that are pegs """
-        peg_list = []
-        for cell_row in self.board:
-            for current_cell in cell_row:
-                if current_cell is not None and not current_cell.get_is_hole():
-                    peg_list.append(current_cell)
-        return peg_list
+        return [current_cell for current_cell in self.cells if self.occupancy[current_cell.index]]
 
     def get_holes(self):
         """ Returns Cell objects from board that are holes """
-        hole_list = []
-        for cell_row in self.board:
-            for current_cell in cell_row:
-                if current_cell is not None and current_cell.get_is_hole():
-                    hole_list.append(current_cell)
-        return hole_list
+        return [current_cell for current_cell in self.cells if not self.occupancy[current_cell.index]]
 
     def get_cell_nums(self):
         """ Returns number of pegs and holes on board """
-        cell_list = self.get_cells()  # only contains Cells that are not None
-        peg_num = 0
-        for current_cell in cell_list:
-            if not current_cell.get_is_hole():
-                peg_num += 1
-        empty_num = len(cell_list) - peg_num
-        return peg_num, empty_num
+        peg_num = sum(self.occupancy)
+        return peg_num, len(self.occupancy) - peg_num
 
     def reset_board(self):
         """ Reset board state by removing all holes """
-        cell_list = self.get_cells()
-        for current_cell in cell_list:
-            current_cell.set_is_hole(False)
+        self.occupancy[:] = b"\x01" * len(self.occupancy)
         self.init_holes(self.holes)
+        self.state_version += 1
+        self.observation_step = 0
+        self.write_observation()
 
     def init_holes(self, holes):
         """ Create initial board state by placing initial given holes """
         for row, col in holes:
             if self.get_cell(row, col) is not None:
-                self.get_cell(row, col).set_is_hole(True)
+                self.occupancy[self.get_cell(row, col).index] = 0
+
+    def write_observation(self):
+        """ Write the occupancy of all cells to the current row of the observation buffer """
+        self.observations[self.observation_step] = np.frombuffer(self.occupancy, dtype=np.uint8)
+
+    def next_observation(self):
+        """ Move to the next row of the observation buffer, starting as a copy of the current state. Called once per
+        action before the moved cells are updated, so earlier states of the episode are kept in earlier rows """
+        self.observations[self.observation_step + 1] = self.observations[self.observation_step]
+        self.observation_step += 1
+
+    def set_is_hole(self, cell, value):
+        """ Change status of cell to peg (value = false) or hole (value = true) and update the observation in place """
+        self.occupancy[cell.index] = 0 if value else 1
+        self.state_version += 1
+        self.observations[self.observation_step, cell.index] = 0.0 if value else 1.0
+
+    def get_state_version(self):
+        """ Returns a number that changes every time the board state changes, so information about the current
+        state can be kept until the next action or reset """
+        return self.state_version
+
+    def get_observation(self):
+        """ Returns the current state as float32 occupancy array of shape (1, number of cells), i.e. the input shape
+        of the neural critic. The array is a view of the observation buffer and is not copied """
+        return self.observations[self.observation_step:self.observation_step + 1]
 
     def get_binary_state(self):
         """ Returns space efficient and readable binary version of state where peg = 1 and hole = 0 """
-        board_state = ""
-        for current_cell in self.get_cells():
-            if not current_cell.get_is_hole():
-                board_state += str(1)
-            else:
-                board_state += str(0)
-        return board_state
+        return self.occupancy.translate(BINARY_DIGITS).decode()
+
+    def get_packed_state(self):
+        """ Returns an immutable copy of the occupancy (one byte per cell), used as key of the current state """
+        return bytes(self.occupancy)
+
+    def get_legal_jumps(self):
+        """ Returns the jumps of the topology that are legal in the current state, as a tuple of actions (moving cell,
+        jumping cell, hole cell). The actions are shared with earlier calls, so a transposition cache entry only adds
+        one tuple (which the garbage collector has to traverse) instead of one tuple per action """
+        occupancy = self.occupancy
+        return tuple([action for action, moving, jumping, hole in self.jump_actions
+                      if occupancy[moving] and occupancy[jumping] and not occupancy[hole]])
 
 
 class DiamondGrid (HexagonalGrid):
     """ Subclass for creating Diamond shaped Hexagonal grid"""
     def __init__(self, size, holes):
-        super().__init__(size, holes)
-        self.make_diamond_board()
-
-    def make_diamond_board(self):
-        """ Fills diamond board with Cell objects and creates neighborhood following Diamond structure requirements"""
-        for r in range(self.boardSize):
-            for c in range(self.boardSize):  # avoid redundant calculation by adding neighbors "behind" current cell
-                new_cell = Cell(r, c)
-                self.board[r][c] = new_cell
-                if c > 0:  # add left neighbor-cell
-                    new_cell.add_neighbor(self.board[r][c-1])
-                if r > 0:  # add above neighbor-cell
-                    new_cell.add_neighbor(self.board[r-1][c])
-                if r > 0 and c < self.boardSize-1:  # add right diagonal neighbor-cell
-                    new_cell.add_neighbor(self.board[r-1][c+1])
+        super().__init__(size, holes, True)
 
 
 class TriangleGrid (HexagonalGrid):
     """ Subclass for creating Triangle shaped Hexagonal grid"""
     def __init__(self, size, holes):
-        super().__init__(size, holes)
-        self.make_triangle_board()
-
-    def make_triangle_board(self):
-        """ Fills triangle board with Cell objects and creates neighborhood following triangle structure requirements"""
-        for r in range(self.boardSize):  # avoid redundant calculation by adding neighbors "behind" current cell
-            for c in range(r + 1):  # achieve triangle shape
-                new_cell = Cell(r, c)
-                self.board[r][c] = new_cell
-                if c > 0 and self.board[r][c-1] is not None:  # add right neighbor-cell
-                    new_cell.add_neighbor(self.board[r][c-1])
-                if r > 0 and self.board[r-1][c] is not None:  # add above neighbor-cell
-                    new_cell.add_neighbor(self.board[r-1][c])
-                if r > 0 and c > 0 and self.board[r-1][c-1] is not None:  # add left diagonal neighbor-cell
-                    new_cell.add_neighbor(self.board[r-1][c-1])
+        super().__init__(size, holes, False)
 
 
 """if __name__ == '__main__':
@@ -7,7 +7,8 @@ class PegPlayer:
         empty cell. Action is performed by changing is_hole property of these cells """
         moving_cell, jumping_cell, hole_cell = action
         if None not in {moving_cell, jumping_cell, hole_cell}:
-            moving_cell.set_is_hole(True)  # Moving cell becomes a hole, since it jumps "into" the hole
-            jumping_cell.set_is_hole(True)  # Jumping cell becomes a hole because its removed
-            hole_cell.set_is_hole(False)  # Hole cell becomes a peg, since moving cell jumps "into" it
+            self.board.next_observation()  # the new state is written to the next row of the observation buffer
+            self.board.set_is_hole(moving_cell, True)  # Moving cell becomes a hole, since it jumps "into" the hole
+            self.board.set_is_hole(jumping_cell, True)  # Jumping cell becomes a hole because its removed
+            self.board.set_is_hole(hole_cell, False)  # Hole cell becomes a peg, since moving cell jumps "into" it
 
@@ -1,16 +1,33 @@
 from environment.peg_player import PegPlayer
 from environment.peg_board import *
+from environment.transposition_cache import TranspositionCache
+
+# Status of a board state
+NEUTRAL = "neutral"
+WINNING = "winning"
+LOSING = "losing"
 
 
 class SimWorld:
     """ Class for creating the PegSolitaire environment and provide RL-agent with necessary information"""
-    def __init__(self, size, is_diamond, start_holes):
+    def __init__(self, size, is_diamond, start_holes, cache_size=None):
+        self.size = size
+        self.is_diamond = is_diamond
+        self.start_holes = start_holes
+        self.cache_size = cache_size
+        self.cache = TranspositionCache(cache_size) if cache_size else None  # None: states are always computed
+        self.current_state_info = None  # (legal actions, status, reward) of the current state
+        self.current_state_version = None  # board state version of current_state_info
         if is_diamond:
             self.board = DiamondGrid(size, start_holes)
         else:
             self.board = TriangleGrid(size, start_holes)
         self.player = PegPlayer(self.board)
 
+    def get_parameters(self):
+        """ Returns the arguments that create a SimWorld like this one, e.g. in the process of a rollout worker """
+        return self.size, self.is_diamond, self.start_holes, self.cache_size
+
     def get_board(self):
         """ Returns board """
         return self.board
@@ -19,17 +36,25 @@ class SimWorld:
         """ Returns player """
         return self.player
 
+    def get_observation(self):
+        """ Returns current state as float32 occupancy array that can be given directly to the neural critic """
+        return self.board.get_observation()
+
+    def get_cache_stats(self):
+        """ Returns hit, miss and eviction counters of the transposition cache, or None if the cache is not used """
+        return self.cache.get_stats() if self.cache is not None else None
+
     def is_neutral_state(self):
         """ Returns true if there are more than one peg on board and at least one available legal action"""
-        return self.board.get_cell_nums()[0] > 1 and len(self.get_legal_actions()) > 0
+        return self.get_state_info()[1] == NEUTRAL
 
     def is_winning_state(self):
         """ Returns true if there is just one peg on board"""
-        return self.board.get_cell_nums()[0] == 1
+        return self.get_state_info()[1] == WINNING
 
     def is_losing_state(self):
         """ Returns true if there are more than one peg on board and no available legal actions"""
-        return self.board.get_cell_nums()[0] > 1 and len(self.get_legal_actions()) == 0
+        return self.get_state_info()[1] == LOSING
 
     def make_state_transition(self, action):
         """ Makes transition between board states by performing given action,
@@ -42,30 +67,41 @@ class SimWorld:
     def get_legal_actions(self):
         """ Returns the actions that can be performed by the player a list of the tuples,
          where each tuple is a combination of a moving cell, a jumping cell and an empty cell"""
-        legal_actions = []
-        for current_hole in self.board.get_holes():  # Looks at all hole cells in current board
-            hole_row, hole_col = current_hole.get_location()
-            hole_neighbors = current_hole.get_neighbors()
-            for hole_neighbor in hole_neighbors:  # Checks if hole cell has neighbors that can be jumped over
-                neigh_row, neigh_col = hole_neighbor.get_location()
-                if not hole_neighbor.get_is_hole():
-                    jumping_neighbors = hole_neighbor.get_neighbors()
-                    for jumping_neighbor in jumping_neighbors:  # Checks if jumping cell has neighbors that can jump
-                        jump_row, jump_col = jumping_neighbor.get_location()
-                        if not jumping_neighbor.get_is_hole():
-                            if (jump_row == neigh_row == hole_row) or (jump_col == neigh_col == hole_col) or \
-                                    ((abs(hole_row-jump_row) == 2) and (abs(hole_col-jump_col) == 2)):
-                                legal_actions.append((jumping_neighbor, hole_neighbor, current_hole))
-        return legal_actions
+        return self.get_state_info()[0]
 
     def get_reward(self):
         """ Returns the reward of being in the current board state"""
-        reward = 0
-        if self.is_losing_state():
-            reward -= self.board.get_cell_nums()[0]
-        elif self.is_winning_state():
-            reward += 1000
-        return reward
+        return self.get_state_info()[2]
+
+    def get_state_info(self):
+        """ Returns tuple (legal actions, status, reward) of the current board state. The result is kept until the
+        board state changes, so the transposition cache is only used (and counted) once for each new state. If the
+        transposition cache is used, a state that has been seen before is found by one lookup instead of scanning
+        the board """
+        state_version = self.board.get_state_version()
+        if self.current_state_version == state_version:
+            return self.current_state_info
+        if self.cache is None:
+            state_info = self.compute_state_info()
+        else:
+            packed_state = self.board.get_packed_state()
+            state_info = self.cache.get(packed_state)
+            if state_info is None:
+                state_info = self.compute_state_info()
+                self.cache.put(packed_state, state_info)
+        self.current_state_info = state_info
+        self.current_state_version = state_version
+        return state_info
+
+    def compute_state_info(self):
+        """ Scans the board to find legal actions, status (neutral, winning or losing) and reward of current state """
+        legal_jumps = self.board.get_legal_jumps()
+        peg_num = self.board.get_cell_nums()[0]
+        if peg_num == 1:
+            return legal_jumps, WINNING, 1000
+        elif peg_num > 1 and len(legal_jumps) > 0:
+            return legal_jumps, NEUTRAL, 0
+        return legal_jumps, LOSING, -peg_num
 
 
 # if __name__ == '__main__':
@@ -0,0 +1,35 @@
+from collections import OrderedDict
+
+
+class TranspositionCache:
+    """ Bounded cache of board states that have been seen before. Key is the packed board state and value is the
+    tuple (legal actions, status, reward), so a repeated state is one lookup instead of a full board scan.
+    The least recently used state is removed when the cache is full """
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.entries = OrderedDict()  # most recently used states are at the end
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, packed_state):
+        """ Returns cached (legal actions, status, reward) of the state, or None if state is not cached """
+        entry = self.entries.get(packed_state)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(packed_state)
+        return entry
+
+    def put(self, packed_state, entry):
+        """ Adds (legal actions, status, reward) of the state, and removes least recently used state if full """
+        self.entries[packed_state] = entry
+        if len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def get_stats(self):
+        """ Returns counters describing how often states are found in the cache """
+        return {"size": len(self.entries), "capacity": self.capacity, "hits": self.hits, "misses": self.misses,
+                "evictions": self.evictions}